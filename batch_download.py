@@ -6,52 +6,183 @@ Read paipu IDs from CSV file and download all records to output directory
 
 Usage:
     python batch_download.py <csv_file>
-    python batch_download.py <csv_file> --delay 2  # Set request interval (seconds)
+    python batch_download.py <csv_file> --concurrency 16  # Set parallel downloads
     python batch_download.py <csv_file> --skip-existing  # Skip already downloaded
 """
 
 import asyncio
 import csv
+import mmap
+import os
+import signal
 import sys
 import argparse
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Import functions from paipu_dl
 from paipu_dl import (
+    MajsoulClient,
     load_credentials,
     download_record,
     OUTPUT_DIR,
 )
 
 
+# Completions between progress lines
+PROGRESS_EVERY = 20
+
+# CSV files larger than this take the mmap fast path
+MMAP_THRESHOLD = 10 * 1024 * 1024
+
+# Recognized paipu ID column names
+PAIPU_COLUMNS = ('牌谱链接', 'paipu_id', 'uuid')
+
+
+class ClientPool:
+    """
+    Pool of persistent authenticated Majsoul clients
+
+    MajsoulClient serializes call() per connection, so a single shared
+    client caps throughput at one RPC in flight. The pool keeps several
+    logged-in connections and hands them out through a queue.
+    """
+
+    def __init__(self):
+        self._clients: list[MajsoulClient] = []
+        self._idle: asyncio.Queue = asyncio.Queue()
+
+    @classmethod
+    async def create(cls, size: int, config: dict) -> "ClientPool":
+        pool = cls()
+        try:
+            for _ in range(size):
+                client = MajsoulClient(config.get("server", "cn"))
+                await client.connect()
+                await client.login(config["access_token"])
+                pool._clients.append(client)
+                pool._idle.put_nowait(client)
+        except Exception:
+            await pool.close()
+            raise
+        return pool
+
+    async def acquire(self) -> MajsoulClient:
+        return await self._idle.get()
+
+    def release(self, client: MajsoulClient):
+        self._idle.put_nowait(client)
+
+    async def close(self):
+        for client in self._clients:
+            await client.close()
+        self._clients.clear()
+
+
+class RateLimiter:
+    """
+    Minimal token-bucket rate limiter for asyncio tasks
+
+    Decouples request rate from concurrency: the semaphore caps how many
+    downloads are in flight while this caps how fast new ones start.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def _load_paipu_ids_mmap(csv_path: str) -> list[str] | None:
+    """
+    Fast path for large CSVs: memory-map the file and split bytes
+    directly, skipping the csv state machine. Returns None if the file
+    uses quoting, which only the csv module handles correctly.
+    """
+    with open(csv_path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            header_end = mm.find(b'\n')
+            if header_end < 0:
+                return None
+            # A quoted header would defeat the naive comma split below;
+            # only the csv module parses that correctly
+            if b'"' in mm[:header_end]:
+                return None
+            header = mm[:header_end].rstrip(b'\r').decode('utf-8').split(',')
+            idx = next((header.index(c) for c in PAIPU_COLUMNS if c in header), None)
+            if idx is None:
+                return []
+            paipu_ids = []
+            for line in mm[header_end + 1:].split(b'\n'):
+                if b'"' in line:
+                    return None
+                parts = line.split(b',')
+                if len(parts) > idx:
+                    value = parts[idx].strip()
+                    if value:
+                        paipu_ids.append(value.decode('utf-8'))
+            return paipu_ids
+        finally:
+            mm.close()
+
+
 def load_paipu_ids_from_csv(csv_path: str) -> list[str]:
     """
     Read all paipu IDs from CSV file
     """
-    paipu_ids = []
-    with open(csv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            # Try common column names for paipu link
-            paipu_id = row.get('牌谱链接', '') or row.get('paipu_id', '') or row.get('uuid', '')
-            paipu_id = paipu_id.strip()
-            if paipu_id:
-                paipu_ids.append(paipu_id)
-    return paipu_ids
+    paipu_ids = None
+    if os.path.getsize(csv_path) > MMAP_THRESHOLD:
+        paipu_ids = _load_paipu_ids_mmap(csv_path)
+
+    if paipu_ids is None:
+        with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            # Resolve the paipu column once instead of per-row dict lookups
+            idx = next((header.index(c) for c in PAIPU_COLUMNS if c in header), None)
+            if idx is None:
+                return []
+            paipu_ids = [r[idx].strip() for r in reader if len(r) > idx and r[idx].strip()]
+
+    # Deduplicate while preserving order; repeated CSV rows would
+    # otherwise trigger repeated downloads
+    return list(dict.fromkeys(paipu_ids))
 
 
 async def batch_download(
     csv_path: str,
-    delay: float = 1.0,
+    concurrency: int = 8,
+    rate: float = 1.0,
     skip_existing: bool = False
 ):
     """
     Batch download game records
-    
+
     Args:
         csv_path: Path to CSV file
-        delay: Delay between requests (seconds)
+        concurrency: Maximum number of downloads in flight
+        rate: Maximum download starts per second (0 = unlimited)
         skip_existing: Whether to skip existing files
     """
     # Load credentials
@@ -59,88 +190,160 @@ async def batch_download(
     if not config:
         print("Error: No credentials found. Please run 'python paipu_dl.py --capture' first.")
         return
-    
+
     # Read paipu ID list
     paipu_ids = load_paipu_ids_from_csv(csv_path)
     if not paipu_ids:
         print(f"Error: No paipu IDs found in {csv_path}")
         return
-    
-    print(f"Found {len(paipu_ids)} records to download")
+
+    total = len(paipu_ids)
+    print(f"Found {total} records to download")
     print(f"Output directory: {OUTPUT_DIR}")
-    print(f"Request delay: {delay} seconds")
+    print(f"Concurrency: {concurrency}")
+    print(f"Rate limit: {rate if rate > 0 else 'unlimited'} req/s")
     print(f"Skip existing: {skip_existing}")
     print("-" * 50)
-    
+
     # Ensure output directory exists
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    
-    # Statistics
-    success_count = 0
-    skip_count = 0
-    fail_count = 0
-    failed_ids = []
-    
-    for i, paipu_id in enumerate(paipu_ids, 1):
-        output_file = OUTPUT_DIR / f"{paipu_id}.json"
-        
+
+    # Bound the worker threads used for offloaded file writes
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=4))
+
+    # Scan the output directory once instead of stat-ing per paipu
+    existing = {e.name[:-5] for e in os.scandir(OUTPUT_DIR) if e.name.endswith('.json')}
+
+    # Per-paipu results: "success" / "skipped" / "failed", with running
+    # counts kept alongside so progress and summary never rescan
+    results: dict[str, str] = {}
+    counts = {"success": 0, "skipped": 0, "failed": 0}
+    sem = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate) if rate > 0 else None
+
+    def _record(paipu_id: str, status: str):
+        prev = results.get(paipu_id)
+        if prev:
+            counts[prev] -= 1
+        results[paipu_id] = status
+        counts[status] += 1
+
+        # One batched progress line per PROGRESS_EVERY completions
+        # instead of three flushing prints per download
+        done = len(results)
+        if done % PROGRESS_EVERY == 0 or done == total:
+            print(f"Progress: {done}/{total} (failed: {counts['failed']})")
+
+    async def _one(paipu_id: str, idx: int):
         # Check if already exists
-        if skip_existing and output_file.exists():
-            print(f"[{i}/{len(paipu_ids)}] Skipped {paipu_id} (already exists)")
-            skip_count += 1
-            continue
-        
-        print(f"[{i}/{len(paipu_ids)}] Downloading {paipu_id} ...", end=" ", flush=True)
-        
+        if skip_existing and paipu_id in existing:
+            _record(paipu_id, "skipped")
+            return
+
+        async with sem:
+            if limiter:
+                await limiter.acquire()
+            client = await pool.acquire()
+            try:
+                result = await download_record(config, paipu_id, client=client, quiet=True)
+            except Exception:
+                result = None
+            finally:
+                pool.release(client)
+
+        _record(paipu_id, "success" if result else "failed")
+
+    # Ctrl-C cancels every task so in-flight downloads stop cleanly and
+    # the partial results below still get written; a --skip-existing
+    # rerun then resumes where this one stopped
+    loop = asyncio.get_running_loop()
+
+    def _cancel_all():
+        for task in asyncio.all_tasks(loop):
+            task.cancel()
+
+    try:
+        loop.add_signal_handler(signal.SIGINT, _cancel_all)
+        has_signal_handler = True
+    except NotImplementedError:  # Windows
+        has_signal_handler = False
+
+    # Connect and login up front; every download draws a persistent
+    # authenticated client from the pool instead of paying connect+login
+    # per paipu
+    interrupted = False
+    pool = await ClientPool.create(min(concurrency, 4), config)
+    try:
         try:
-            await download_record(config, paipu_id)
-            
-            # Check if successful
-            if output_file.exists():
-                print("✓ Success")
-                success_count += 1
-            else:
-                print("✗ Failed (file not generated)")
-                fail_count += 1
-                failed_ids.append(paipu_id)
-        except Exception as e:
-            print(f"✗ Failed ({e})")
-            fail_count += 1
-            failed_ids.append(paipu_id)
-        
-        # Delay to avoid rate limiting
-        if i < len(paipu_ids):
-            await asyncio.sleep(delay)
-    
+            async with asyncio.TaskGroup() as tg:
+                for i, paipu_id in enumerate(paipu_ids, 1):
+                    tg.create_task(_one(paipu_id, i))
+
+            # One polite retry pass over the failures at half the
+            # concurrency and rate before giving up on them
+            retry_ids = [pid for pid in paipu_ids if results.get(pid) == "failed"]
+            if retry_ids:
+                print(f"Retrying {len(retry_ids)} failed downloads at reduced rate...")
+                sem = asyncio.Semaphore(max(1, concurrency // 2))
+                if limiter:
+                    limiter = RateLimiter(rate / 2)
+                async with asyncio.TaskGroup() as tg:
+                    for i, paipu_id in enumerate(retry_ids, 1):
+                        tg.create_task(_one(paipu_id, i))
+        except asyncio.CancelledError:
+            interrupted = True
+            print("\nInterrupted, shutting down...")
+    finally:
+        await pool.close()
+        if has_signal_handler:
+            loop.remove_signal_handler(signal.SIGINT)
+
+    failed_ids = [pid for pid in paipu_ids if results.get(pid) == "failed"]
+
     # Print statistics
     print("-" * 50)
-    print("Download complete!")
-    print(f"  Success: {success_count}")
-    print(f"  Skipped: {skip_count}")
-    print(f"  Failed: {fail_count}")
-    
+    if interrupted:
+        print(f"Download interrupted ({len(results)}/{total} attempted). "
+              f"Rerun with --skip-existing to resume.")
+    else:
+        print("Download complete!")
+    print(f"  Success: {counts['success']}")
+    print(f"  Skipped: {counts['skipped']}")
+    print(f"  Failed: {counts['failed']}")
+
     if failed_ids:
-        print(f"\nFailed paipu IDs:")
-        for pid in failed_ids:
-            print(f"  - {pid}")
+        # One batched write instead of a print per failure
+        failed_log = Path(csv_path).with_suffix('.failed.txt')
+        failed_log.write_text('\n'.join(failed_ids) + '\n')
+        print(f"\nFailed paipu IDs written to: {failed_log}")
 
 
 def main():
+    # Use uvloop when available (Linux/macOS) for cheaper task
+    # scheduling; the stock loop remains the Windows fallback
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
     parser = argparse.ArgumentParser(description="Batch download Majsoul game records")
     parser.add_argument("csv_file", type=str, help="Path to CSV file containing paipu IDs")
-    parser.add_argument("--delay", type=float, default=1.0, help="Request delay in seconds (default: 1.0)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum parallel downloads (default: 8)")
+    parser.add_argument("--rate", type=float, default=1.0, help="Maximum download starts per second, 0 for unlimited (default: 1.0)")
     parser.add_argument("--skip-existing", action="store_true", help="Skip already downloaded records")
-    
+
     args = parser.parse_args()
-    
+
     csv_path = Path(args.csv_file)
     if not csv_path.exists():
         print(f"Error: File not found {csv_path}")
         sys.exit(1)
-    
+
     asyncio.run(batch_download(
         str(csv_path),
-        delay=args.delay,
+        concurrency=args.concurrency,
+        rate=args.rate,
         skip_existing=args.skip_existing
     ))
 
@@ -14,20 +14,36 @@ Usage:
 
 import asyncio
 import json
+import os
+import pickle
+import re
 import struct
 import time
 import argparse
 import base64
 import uuid
+from functools import lru_cache
 from pathlib import Path
+from urllib.parse import urlsplit
 from typing import Optional, List
 from enum import IntEnum
 
 import aiohttp
 import websockets
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from proto import liqi_pb2 as pb
-from google.protobuf.json_format import MessageToDict
+from google.protobuf import message_factory
+from google.protobuf.json_format import MessageToDict, ParseDict
 
 
 # ============== Configuration ==============
@@ -36,6 +52,9 @@ CONFIG_DIR = Path(__file__).parent / ".config"
 OUTPUT_DIR = Path(__file__).parent / "output"
 CONFIG_FILE = CONFIG_DIR / "credentials.json"
 
+# Plain-string form for hot paths that only need os.path joins
+OUTPUT_DIR_STR = os.fspath(OUTPUT_DIR)
+
 # Server configurations
 SERVERS = {
     "cn": {
@@ -63,66 +82,174 @@ class MsgType(IntEnum):
     RESPONSE = 3
 
 
+# Frame header: msg type byte + little-endian 2-byte msg_id. A
+# precompiled Struct skips format-string parsing on every pack/unpack
+_FRAME_HDR = struct.Struct("<BH")
+
+
+class LazyB64:
+    """Bytes field from the dynamic decoder, base64-encoded only on demand
+
+    The decoder used to base64 every bytes/unknown field eagerly, even
+    blobs the caller parses as raw protobuf or never looks at. Holding
+    the raw bytes defers that O(size) work to JSON-dump time (via the
+    _json_default hook) for the fields that actually reach disk.
+    """
+    __slots__ = ("raw",)
+
+    def __init__(self, raw):
+        self.raw = bytes(raw)
+
+    def __str__(self):
+        return base64.b64encode(self.raw).decode()
+
+    def __repr__(self):
+        return f"LazyB64({len(self.raw)} bytes)"
+
+
+def _json_default(obj):
+    if isinstance(obj, LazyB64):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _decode_varint(data: bytes, pos: int) -> tuple:
+    """Decode varint from bytes, return (value, new_pos)
+
+    Module-level so the hot decode loops pay one global lookup per call
+    instead of bound-method dispatch. Single-byte values (the majority:
+    field tags and small lengths) return without entering the loop.
+    """
+    byte = data[pos]
+    if byte < 0x80:
+        return byte, pos + 1
+
+    result = byte & 0x7F
+    shift = 7
+    pos += 1
+    while True:
+        byte = data[pos]
+        result |= (byte & 0x7F) << shift
+        pos += 1
+        if not (byte & 0x80):
+            break
+        shift += 7
+    return result, pos
+
+
+# method name (e.g. ".lq.Lobby.fetchGameRecord") -> (request_cls, response_cls),
+# built lazily from the generated descriptor
+_PB_METHODS = None
+
+def _pb_method_types() -> dict:
+    """Map RPC method names to generated request/response classes"""
+    global _PB_METHODS
+    if _PB_METHODS is None:
+        _PB_METHODS = {
+            f".{service.full_name}.{method.name}": (
+                message_factory.GetMessageClass(method.input_type),
+                message_factory.GetMessageClass(method.output_type),
+            )
+            for service in pb.DESCRIPTOR.services_by_name.values()
+            for method in service.methods
+        }
+    return _PB_METHODS
+
+
+def _fields_by_id(type_def: dict) -> dict:
+    """Field-id lookup table for decoding a message type"""
+    return {f["id"]: (name, f) for name, f in type_def.get("fields", {}).items()}
+
+
+def _encode_plan(type_def: dict, types: dict) -> list:
+    """Flat (name, id, type, repeated, nested) tuples for encoding a
+    message type; nested is the fully-qualified message type name, or
+    None for scalar fields. Resolving here (and memoizing on the field
+    dict for the decode path) replaces two dict lookups per field on
+    the hot paths with none."""
+    plan = []
+    for name, f in type_def.get("fields", {}).items():
+        field_type = f["type"]
+        if field_type in types:
+            nested = field_type
+        elif f"lq.{field_type}" in types:
+            nested = f"lq.{field_type}"
+        else:
+            nested = None
+        f["_resolved_type"] = nested
+        plan.append((name, f["id"], field_type, f.get("rule") == "repeated", nested))
+    return plan
+
+
 class MajsoulCodec:
     """Encode/decode Majsoul protobuf messages using dynamic proto definition"""
     
-    def __init__(self, proto_def: dict):
+    def __init__(self, proto_def: dict = None, types: dict = None, services: dict = None):
         self.proto_def = proto_def
         self.msg_index = 0
         self.pending_requests = {}  # msg_id -> (method_name, response_type)
-        
-        # Build type registry from proto definition
-        self.types = {}
-        self.services = {}
-        self._parse_proto_def(proto_def)
-    
+
+        if types is not None and services is not None:
+            # Registry restored from the on-disk cache
+            self.types = types
+            self.services = services
+        else:
+            # Build type registry from proto definition
+            self.types = {}
+            self.services = {}
+            self._parse_proto_def(proto_def)
+            # Second pass once every type is registered: precompute the
+            # per-field lookup structures the codec hot paths need,
+            # including resolved nested-message type names
+            for value in self.types.values():
+                value["_fields_by_id"] = _fields_by_id(value)
+                value["_encode_plan"] = _encode_plan(value, self.types)
+
     def _parse_proto_def(self, proto_def: dict, prefix: str = ""):
         """Parse proto definition to build type and service registry"""
         nested = proto_def.get("nested", {})
         for name, value in nested.items():
             full_name = f"{prefix}.{name}" if prefix else name
-            
+
             if "fields" in value:
                 # This is a message type
                 self.types[full_name] = value
             elif "methods" in value:
                 # This is a service
                 self.services[full_name] = value
-            
+
             # Recurse into nested definitions
             if "nested" in value:
                 self._parse_proto_def(value, full_name)
     
-    def _encode_varint(self, value: int) -> bytes:
-        """Encode integer as varint"""
-        result = []
-        while value > 127:
-            result.append((value & 0x7F) | 0x80)
-            value >>= 7
-        result.append(value)
-        return bytes(result)
-    
-    def _decode_varint(self, data: bytes, pos: int) -> tuple:
-        """Decode varint from bytes, return (value, new_pos)"""
-        result = 0
-        shift = 0
-        while True:
-            byte = data[pos]
-            result |= (byte & 0x7F) << shift
-            pos += 1
-            if not (byte & 0x80):
-                break
-            shift += 7
-        return result, pos
-    
-    def _encode_field(self, field_num: int, wire_type: int, value: bytes) -> bytes:
-        """Encode a protobuf field"""
-        tag = (field_num << 3) | wire_type
-        return self._encode_varint(tag) + value
-    
-    def _encode_string(self, field_num: int, value: bytes) -> bytes:
-        """Encode a length-delimited field (string/bytes/message)"""
-        return self._encode_field(field_num, 2, self._encode_varint(len(value)) + value)
+    def _encode_varint(self, value: int, out: bytearray):
+        """Append varint encoding of value to out, unrolled for the
+        common 1-3 byte cases"""
+        if value < 0x80:
+            out.append(value)
+        elif value < 0x4000:
+            out.append(value & 0x7F | 0x80)
+            out.append(value >> 7)
+        elif value < 0x200000:
+            out.append(value & 0x7F | 0x80)
+            out.append((value >> 7) & 0x7F | 0x80)
+            out.append(value >> 14)
+        else:
+            while value > 127:
+                out.append((value & 0x7F) | 0x80)
+                value >>= 7
+            out.append(value)
+
+    def _encode_field(self, field_num: int, wire_type: int, value: bytes, out: bytearray):
+        """Append a protobuf field (tag + payload) to out"""
+        self._encode_varint((field_num << 3) | wire_type, out)
+        out += value
+
+    def _encode_string(self, field_num: int, value: bytes, out: bytearray):
+        """Append a length-delimited field (string/bytes/message) to out"""
+        self._encode_varint((field_num << 3) | 2, out)
+        self._encode_varint(len(value), out)
+        out += value
     
     def _encode_message(self, type_name: str, data: dict) -> bytes:
         """Encode a message to protobuf bytes"""
@@ -133,74 +260,85 @@ class MajsoulCodec:
         if not type_def:
             raise ValueError(f"Unknown type: {type_name}")
         
-        result = b""
-        fields = type_def.get("fields", {})
-        
-        for field_name, field_def in fields.items():
+        # Accumulate into a bytearray: bytes += would copy the whole
+        # message again for every field
+        result = bytearray()
+
+        # _encode_plan may be absent from registries cached before it
+        # existed; build and memoize it on first use
+        plan = type_def.get("_encode_plan")
+        if plan is None:
+            plan = type_def["_encode_plan"] = _encode_plan(type_def, self.types)
+
+        for field_name, field_id, field_type, is_repeated, nested_type in plan:
             if field_name not in data:
                 continue
-            
+
             value = data[field_name]
-            field_id = field_def["id"]
-            field_type = field_def["type"]
-            is_repeated = field_def.get("rule") == "repeated"
-            
+
             # Handle repeated fields
             if is_repeated and isinstance(value, list):
                 for item in value:
-                    result += self._encode_single_field(field_id, field_type, item)
+                    self._encode_single_field(field_id, field_type, item, result, nested_type)
             else:
-                result += self._encode_single_field(field_id, field_type, value)
-        
-        return result
-    
-    def _encode_single_field(self, field_id: int, field_type: str, value) -> bytes:
-        """Encode a single field value"""
+                self._encode_single_field(field_id, field_type, value, result, nested_type)
+
+        return bytes(result)
+
+    def _encode_single_field(self, field_id: int, field_type: str, value, out: bytearray,
+                             nested_type: Optional[str] = None):
+        """Append a single field value to out"""
         if value is None:
-            return b""
-        
+            return
+
         if field_type == "string":
             if isinstance(value, str):
                 value = value.encode("utf-8")
-            return self._encode_string(field_id, value)
+            self._encode_string(field_id, value, out)
         elif field_type == "bytes":
-            return self._encode_string(field_id, value)
+            self._encode_string(field_id, value, out)
         elif field_type in ("int32", "int64", "uint32", "uint64"):
-            return self._encode_field(field_id, 0, self._encode_varint(int(value)))
+            self._encode_varint(field_id << 3, out)
+            self._encode_varint(int(value), out)
         elif field_type == "bool":
-            return self._encode_field(field_id, 0, self._encode_varint(1 if value else 0))
-        elif field_type in self.types or f"lq.{field_type}" in self.types:
+            self._encode_varint(field_id << 3, out)
+            out.append(1 if value else 0)
+        elif nested_type is not None:
             # Nested message
             if isinstance(value, dict):
-                nested_bytes = self._encode_message(field_type, value)
-                return self._encode_string(field_id, nested_bytes)
-        
-        return b""
+                nested_bytes = self._encode_message(nested_type, value)
+                self._encode_string(field_id, nested_bytes, out)
     
-    def _decode_message(self, type_name: str, data: bytes) -> dict:
-        """Decode protobuf bytes to dict"""
+    def _decode_message(self, type_name: str, data) -> dict:
+        """Decode protobuf bytes (or a memoryview) to dict"""
         type_def = self.types.get(type_name)
         if not type_def:
             type_def = self.types.get(f"lq.{type_name}")
         if not type_def:
-            return {"_raw": base64.b64encode(data).decode()}
-        
+            return {"_raw": LazyB64(data)}
+
+        # Slice through a memoryview so sub-message and skipped-field
+        # slices are views, not copies
+        if not isinstance(data, memoryview):
+            data = memoryview(data)
+
         result = {}
-        fields = type_def.get("fields", {})
-        field_by_id = {f["id"]: (name, f) for name, f in fields.items()}
-        
+        field_by_id = type_def.get("_fields_by_id")
+        if field_by_id is None:
+            field_by_id = type_def["_fields_by_id"] = _fields_by_id(type_def)
+
         pos = 0
         while pos < len(data):
-            tag, pos = self._decode_varint(data, pos)
+            tag, pos = _decode_varint(data, pos)
             field_id = tag >> 3
             wire_type = tag & 0x7
             
             if field_id not in field_by_id:
                 # Skip unknown field
                 if wire_type == 0:
-                    _, pos = self._decode_varint(data, pos)
+                    _, pos = _decode_varint(data, pos)
                 elif wire_type == 2:
-                    length, pos = self._decode_varint(data, pos)
+                    length, pos = _decode_varint(data, pos)
                     pos += length
                 continue
             
@@ -208,30 +346,45 @@ class MajsoulCodec:
             field_type = field_def["type"]
             
             if wire_type == 0:  # Varint
-                value, pos = self._decode_varint(data, pos)
+                value, pos = _decode_varint(data, pos)
                 if field_type == "bool":
                     value = bool(value)
                 result[field_name] = value
             elif wire_type == 2:  # Length-delimited
-                length, pos = self._decode_varint(data, pos)
+                length, pos = _decode_varint(data, pos)
                 value = data[pos:pos + length]
                 pos += length
-                
+
                 if field_type == "string":
-                    result[field_name] = value.decode("utf-8")
+                    result[field_name] = str(value, "utf-8")
                 elif field_type == "bytes":
-                    result[field_name] = base64.b64encode(value).decode()
-                elif field_type in self.types or f"lq.{field_type}" in self.types:
-                    result[field_name] = self._decode_message(field_type, value)
+                    result[field_name] = LazyB64(value)
                 else:
-                    result[field_name] = base64.b64encode(value).decode()
+                    # False sentinel: None is a valid memoized answer
+                    # (scalar field), absent means not resolved yet
+                    nested_type = field_def.get("_resolved_type", False)
+                    if nested_type is False:
+                        nested_type = field_def["_resolved_type"] = (
+                            field_type if field_type in self.types
+                            else f"lq.{field_type}" if f"lq.{field_type}" in self.types
+                            else None
+                        )
+                    if nested_type is not None:
+                        result[field_name] = self._decode_message(nested_type, value)
+                    else:
+                        result[field_name] = LazyB64(value)
         
         return result
     
     def encode_request(self, method_name: str, payload: dict) -> bytes:
         """Encode a request message"""
-        self.msg_index += 1
-        msg_id = self.msg_index
+        # msg_id is a 2-byte wire field: wrap within 1..65535 so
+        # long-lived (pooled) connections can serve any number of RPCs,
+        # skipping ids whose response is still outstanding
+        msg_id = self.msg_index % 0xFFFF + 1
+        while msg_id in self.pending_requests:
+            msg_id = msg_id % 0xFFFF + 1
+        self.msg_index = msg_id
         
         # Parse method name: .lq.Lobby.fetchGameRecord
         parts = method_name.lstrip(".").split(".")
@@ -255,18 +408,25 @@ class MajsoulCodec:
         
         # Store for response decoding
         self.pending_requests[msg_id] = (method_name, response_type)
-        
-        # Encode the request payload
-        request_data = self._encode_message(request_type, payload)
-        
-        # Wrap in Wrapper message
-        wrapper_data = (
-            self._encode_string(1, method_name.encode()) +
-            self._encode_string(2, request_data)
-        )
-        
+
+        # Encode the request payload via the generated classes (C++
+        # runtime) when the method is known to the vendored proto,
+        # falling back to the dynamic dict codec otherwise
+        pb_types = _pb_method_types().get(method_name)
+        if pb_types:
+            req = pb_types[0]()
+            ParseDict(payload, req, ignore_unknown_fields=True)
+            request_data = req.SerializeToString()
+            wrapper_data = pb.Wrapper(name=method_name, data=request_data).SerializeToString()
+        else:
+            request_data = self._encode_message(request_type, payload)
+            wrapper_buf = bytearray()
+            self._encode_string(1, method_name.encode(), wrapper_buf)
+            self._encode_string(2, request_data, wrapper_buf)
+            wrapper_data = bytes(wrapper_buf)
+
         # Build final message: type(1) + msg_id(2) + wrapper
-        return bytes([MsgType.REQUEST]) + struct.pack("<H", msg_id) + wrapper_data
+        return _FRAME_HDR.pack(MsgType.REQUEST, msg_id) + wrapper_data
     
     def decode_response(self, data: bytes) -> Optional[dict]:
         """Decode a response message"""
@@ -276,42 +436,38 @@ class MajsoulCodec:
         msg_type = data[0]
         
         if msg_type == MsgType.RESPONSE:
-            msg_id = struct.unpack("<H", data[1:3])[0]
+            _, msg_id = _FRAME_HDR.unpack_from(data)
             
             if msg_id not in self.pending_requests:
                 return None
             
             method_name, response_type = self.pending_requests.pop(msg_id)
-            
-            # Parse wrapper
-            wrapper_data = data[3:]
-            pos = 0
-            method = None
-            payload_data = None
-            
-            while pos < len(wrapper_data):
-                tag, pos = self._decode_varint(wrapper_data, pos)
-                field_id = tag >> 3
-                wire_type = tag & 0x7
-                
-                if wire_type == 2:
-                    length, pos = self._decode_varint(wrapper_data, pos)
-                    value = wrapper_data[pos:pos + length]
-                    pos += length
-                    
-                    if field_id == 1:
-                        method = value.decode()
-                    elif field_id == 2:
-                        payload_data = value
-            
+
+            # Parse wrapper with the generated class (C++ runtime)
+            wrapper = pb.Wrapper()
+            wrapper.ParseFromString(data[3:])
+            payload_data = wrapper.data
+
             if payload_data:
-                payload = self._decode_message(response_type, payload_data)
+                pb_types = _pb_method_types().get(method_name)
+                message = None
+                payload = None
+                if pb_types:
+                    # Leave the native message as-is; the caller
+                    # converts to a dict only when it wants one, so
+                    # raw consumers (fetchGameRecord) never pay a
+                    # MessageToDict pass over the record blob
+                    message = pb_types[1]()
+                    message.ParseFromString(payload_data)
+                else:
+                    payload = self._decode_message(response_type, payload_data)
                 return {
                     "id": msg_id,
                     "method": method_name,
                     "data": payload,
+                    "message": message,
                 }
-        
+
         return None
 
 
@@ -319,13 +475,27 @@ class MajsoulCodec:
 
 DECODE_KEYS = [0x84, 0x5e, 0x4e, 0x42, 0x39, 0xa2, 0x1f, 0x60, 0x1c]
 
-def decode_record_data(data: bytes) -> bytes:
-    """Decode XOR encrypted game record data"""
-    data = bytearray(data)
-    for i in range(len(data)):
-        u = (23 ^ len(data)) + 5 * i + DECODE_KEYS[i % len(DECODE_KEYS)] & 255
-        data[i] ^= u
-    return bytes(data)
+if np is not None:
+    _DECODE_KEYS_NP = np.array(DECODE_KEYS, dtype=np.uint8)
+
+    @lru_cache(maxsize=8)
+    def _xor_mask(n: int):
+        """Keystream for an n-byte record (depends only on n)"""
+        i = np.arange(n, dtype=np.int64)
+        return (((23 ^ n) + 5 * i + _DECODE_KEYS_NP[i % len(DECODE_KEYS)]) & 0xFF).astype(np.uint8)
+
+    def decode_record_data(data: bytes) -> bytes:
+        """Decode XOR encrypted game record data (vectorized)"""
+        arr = np.frombuffer(data, dtype=np.uint8)
+        return (arr ^ _xor_mask(len(data))).tobytes()
+else:
+    def decode_record_data(data: bytes) -> bytes:
+        """Decode XOR encrypted game record data"""
+        data = bytearray(data)
+        for i in range(len(data)):
+            u = (23 ^ len(data)) + 5 * i + DECODE_KEYS[i % len(DECODE_KEYS)] & 255
+            data[i] ^= u
+        return bytes(data)
 
 
 # ============== Majsoul API Client ==============
@@ -341,16 +511,25 @@ class MajsoulClient:
         self.codec = None
         self.version = None
         self.client_version_string = None
-        
+        self._call_lock = asyncio.Lock()
+        self._http: Optional[aiohttp.ClientSession] = None
+        self._futures = {}  # msg_id -> Future for in-flight calls
+        self._recv_task = None
+
     async def _fetch_json(self, url: str, bust_cache: bool = False) -> dict:
         """Fetch JSON from URL"""
         if bust_cache:
             url += ("&" if "?" in url else "?") + f"randv={int(time.time() * 1000)}"
-        
-        headers = {"User-Agent": USER_AGENT}
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as resp:
-                return await resp.json()
+
+        # One session for the client's lifetime so sequential fetches
+        # to the same host reuse the TCP+TLS connection
+        if self._http is None:
+            self._http = aiohttp.ClientSession(
+                headers={"User-Agent": USER_AGENT},
+                connector=aiohttp.TCPConnector(limit=8, ttl_dns_cache=300),
+            )
+        async with self._http.get(url) as resp:
+            return await resp.json()
     
     async def _get_server_list(self) -> List[str]:
         """Get available WebSocket servers"""
@@ -361,11 +540,29 @@ class MajsoulClient:
         
         # Get resource version info
         res_info = await self._fetch_json(f"{self.base_url}resversion{self.version}.json")
-        
-        # Get proto definition
-        pb_prefix = res_info["res"]["res/proto/liqi.json"]["prefix"]
-        proto_def = await self._fetch_json(f"{self.base_url}{pb_prefix}/res/proto/liqi.json")
-        self.codec = MajsoulCodec(proto_def)
+
+        # The parsed proto registry only changes with the game version;
+        # reuse the cached copy and skip the liqi.json fetch when fresh
+        # The _r2 suffix versions the registry layout: caches written
+        # before fields carried _resolved_type must not be loaded
+        cache_file = CONFIG_DIR / f"proto_{self.version}_r2.pkl"
+        if cache_file.exists():
+            try:
+                types, services = pickle.loads(cache_file.read_bytes())
+                self.codec = MajsoulCodec(types=types, services=services)
+            except Exception:
+                self.codec = None
+
+        if self.codec is None:
+            # Get proto definition
+            pb_prefix = res_info["res"]["res/proto/liqi.json"]["prefix"]
+            proto_def = await self._fetch_json(f"{self.base_url}{pb_prefix}/res/proto/liqi.json")
+            self.codec = MajsoulCodec(proto_def)
+            try:
+                CONFIG_DIR.mkdir(parents=True, exist_ok=True)
+                cache_file.write_bytes(pickle.dumps((self.codec.types, self.codec.services)))
+            except OSError:
+                pass
         
         # Get config with server list
         config_prefix = res_info["res"]["config.json"]["prefix"]
@@ -383,9 +580,9 @@ class MajsoulClient:
             for gw in ip_def["gateways"]:
                 url = gw.get("url", "")
                 if url:
-                    # Remove http(s):// prefix
-                    url = url.replace("https://", "").replace("http://", "")
-                    servers.append(url)
+                    # Strip any http(s):// prefix, keeping host and path
+                    parts = urlsplit(url)
+                    servers.append(parts.netloc + parts.path if parts.netloc else url)
         
         # Try region_urls
         if not servers and ip_def.get("region_urls"):
@@ -426,6 +623,7 @@ class MajsoulClient:
                     ws_url,
                     additional_headers={"User-Agent": USER_AGENT},
                 )
+                self._recv_task = asyncio.create_task(self._recv_loop())
                 print("Connected!")
                 return
             except Exception as e:
@@ -435,24 +633,60 @@ class MajsoulClient:
         
         raise Exception(f"Failed to connect to any server: {last_error}")
     
+    async def _recv_loop(self):
+        """Pump incoming frames and resolve the matching call futures"""
+        try:
+            async for frame in self.ws:
+                result = self.codec.decode_response(frame)
+                if not result:
+                    continue
+                future = self._futures.pop(result["id"], None)
+                if future and not future.done():
+                    future.set_result(result)
+        finally:
+            # Connection gone: fail whatever is still waiting
+            for future in self._futures.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Connection closed"))
+            self._futures.clear()
+
     async def close(self):
         """Close connection"""
+        if self._recv_task:
+            self._recv_task.cancel()
+            self._recv_task = None
         if self.ws:
             await self.ws.close()
+        if self._http:
+            await self._http.close()
+            self._http = None
     
-    async def call(self, method: str, payload: dict = None) -> dict:
-        """Call an API method"""
+    async def call(self, method: str, payload: dict = None, raw: bool = False) -> dict:
+        """Call an API method
+
+        With raw=True the decoded protobuf message is returned instead
+        of a dict (when the method is known to the vendored proto),
+        sparing large bytes fields a base64 round trip.
+        """
         if payload is None:
             payload = {}
-        
-        request = self.codec.encode_request(method, payload)
-        await self.ws.send(request)
-        
-        while True:
-            response = await self.ws.recv()
-            result = self.codec.decode_response(response)
-            if result:
-                return result["data"]
+
+        # The lock only covers encode+send so msg_ids go out in order;
+        # responses are matched to futures by the receive loop, letting
+        # any number of calls overlap on one socket
+        async with self._call_lock:
+            request = self.codec.encode_request(method, payload)
+            future = asyncio.get_running_loop().create_future()
+            self._futures[self.codec.msg_index] = future
+            await self.ws.send(request)
+
+        result = await future
+        message = result.get("message")
+        if message is not None:
+            if raw:
+                return message
+            return MessageToDict(message, preserving_proto_field_name=True)
+        return result["data"]
     
     async def login(self, access_token: str):
         """Login with access token"""
@@ -510,16 +744,27 @@ class MajsoulClient:
             "type": 0,
         })
     
-    async def fetch_record(self, game_uuid: str) -> dict:
-        """Fetch a specific game record"""
+    async def fetch_record(self, game_uuid: str):
+        """Fetch a specific game record
+
+        Returns the native ResGameRecord message when the vendored proto
+        covers it, otherwise a decoded dict.
+        """
         return await self.call(".lq.Lobby.fetchGameRecord", {
             "game_uuid": game_uuid,
             "client_version_string": self.client_version_string,
-        })
+        }, raw=True)
 
 
 # ============== Credential Capture ==============
 
+# Credential patterns, compiled once at import; they run on raw frame
+# bytes so the capture handler never has to decode whole frames
+_TOKEN_RE = re.compile(rb'["\x12]([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})')
+_ACCT_RE = re.compile(rb'accountId[^0-9]*(\d{6,12})')
+_NUM_RE = re.compile(rb'(\d{7,10})')
+
+
 def capture_credentials():
     """Capture credentials via Playwright browser automation"""
     try:
@@ -548,37 +793,44 @@ def capture_credentials():
         """Parse WebSocket message to extract credentials"""
         if not isinstance(msg, bytes) or len(msg) < 4:
             return
-        
-        import re
-        
+
+        # Nothing left to capture
+        if captured["access_token"] and captured["account_id"]:
+            return
+
+        # Cheap byte-level prefilter: most frames are gameplay/heartbeat
+        # traffic and short-circuit here before any regex work (Lobby
+        # covers the binary account-id fallback)
+        if (b"accessToken" not in msg and b"accountId" not in msg
+                and b"Lobby" not in msg):
+            return
+
         try:
-            msg_str = msg.decode("utf-8", errors="ignore")
-            
             # Debug: show messages containing login-related keywords
-            if "login" in msg_str.lower() or "account" in msg_str.lower() or "token" in msg_str.lower():
+            low = msg.lower()
+            if b"login" in low or b"account" in low or b"token" in low:
                 print(f"[DEBUG] Found relevant message, length={len(msg)}")
-            
+
             # Look for accessToken - try multiple patterns
-            if "accessToken" in msg_str or "access_token" in msg_str:
+            if b"accessToken" in msg or b"access_token" in msg:
                 # Pattern 1: UUID format (most common)
-                match = re.search(r'["\x12]([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})', msg_str)
+                match = _TOKEN_RE.search(msg)
                 if match and not captured["access_token"]:
-                    captured["access_token"] = match.group(1)
+                    captured["access_token"] = match.group(1).decode()
                     print(f"[*] Captured access_token: {captured['access_token']}")
-            
+
             # Look for accountId - it's usually encoded as varint after field tag
-            if "accountId" in msg_str or "account_id" in msg_str or b'\x08' in msg:
+            if b"accountId" in msg or b"account_id" in msg or b'\x08' in msg:
                 # Try to find account ID (usually a 7-8 digit number)
-                match = re.search(r'accountId[^0-9]*(\d{6,12})', msg_str)
+                match = _ACCT_RE.search(msg)
                 if match and not captured["account_id"]:
                     captured["account_id"] = int(match.group(1))
                     print(f"[*] Captured account_id: {captured['account_id']}")
-                
+
                 # Also try to extract from binary - look for the pattern after "Lobby.login" response
-                if not captured["account_id"] and b'Lobby' in msg and msg[0] == 3:
+                if not captured["account_id"] and msg.find(b'Lobby') >= 0 and msg[0] == 3:
                     # Try to find 8-digit number in the message
-                    nums = re.findall(r'(\d{7,10})', msg_str)
-                    for num in nums:
+                    for num in _NUM_RE.findall(msg):
                         n = int(num)
                         if 10000000 < n < 100000000:  # Reasonable account ID range
                             captured["account_id"] = n
@@ -659,33 +911,81 @@ async def list_records(config: dict, count: int = 10):
         await client.close()
 
 
-async def download_record(config: dict, game_uuid: str):
-    """Download a specific game record and parse to readable JSON"""
-    client = MajsoulClient(config.get("server", "cn"))
-    
+async def download_record(config: dict, game_uuid: str, client: Optional[MajsoulClient] = None,
+                          quiet: bool = False):
+    """Download a specific game record and parse to readable JSON
+
+    If a connected, logged-in client is passed in, it is reused (and left
+    open); otherwise a one-shot client is created and closed. With
+    quiet=True the per-record progress prints are suppressed, for batch
+    callers that report progress themselves.
+    """
+    own_client = client is None
+    if own_client:
+        client = MajsoulClient(config.get("server", "cn"))
+        # Batch callers create the output directory once up front
+        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
     try:
-        await client.connect()
-        await client.login(config["access_token"])
-        
-        print(f"\nFetching record: {game_uuid}")
+        if own_client:
+            await client.connect()
+            await client.login(config["access_token"])
+
+        if not quiet:
+            print(f"\nFetching record: {game_uuid}")
         record = await client.fetch_record(game_uuid)
         
         # Parse the record into readable format
         result = parse_game_record(record)
-        
-        # Save to file
-        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-        output_file = OUTPUT_DIR / f"{game_uuid}.json"
-        output_file.write_text(json.dumps(result, indent=2, ensure_ascii=False))
-        print(f"Saved to: {output_file}")
-        print(f"Actions: {len(result.get('actions', []))}")
+
+        # Save to file; serialize and write in a worker thread so the
+        # event loop stays free for other in-flight downloads
+        output_file = os.path.join(OUTPUT_DIR_STR, game_uuid + ".json")
+        await asyncio.to_thread(_write_json, output_file, result)
+        if not quiet:
+            print(f"Saved to: {output_file}")
+            print(f"Actions: {len(result.get('actions', []))}")
         
         return result
-        
+
+    finally:
+        if own_client:
+            await client.close()
+
+
+async def download_records(config: dict, game_uuids: List[str]):
+    """Download several records in parallel over one connection"""
+    client = MajsoulClient(config.get("server", "cn"))
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    sem = asyncio.Semaphore(4)
+
+    async def _one(game_uuid: str):
+        async with sem:
+            try:
+                await download_record(config, game_uuid, client=client)
+            except Exception as e:
+                print(f"Failed {game_uuid}: {e}")
+
+    try:
+        await client.connect()
+        await client.login(config["access_token"])
+        await asyncio.gather(*(_one(u) for u in game_uuids))
     finally:
         await client.close()
 
 
+def _write_json(path: str, result: dict):
+    """Serialize and write a parsed record (runs in a worker thread)"""
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2, default=_json_default))
+    else:
+        # json.dump streams to the file instead of building the whole
+        # pretty-printed string in memory first
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False, default=_json_default)
+
+
 def parse_single_pb(data: bytes, msg_class) -> dict:
     """Parse a single protobuf message"""
     try:
@@ -699,72 +999,79 @@ def parse_single_pb(data: bytes, msg_class) -> dict:
 def parse_repeated_pb(data: bytes, msg_class) -> list:
     """Parse repeated protobuf messages (length-delimited)"""
     results = []
+    mv = memoryview(data)
+    n = len(mv)
     pos = 0
-    while pos < len(data):
-        # Read field tag
-        if pos >= len(data):
+    while pos < n:
+        # Read field tag; bail on non-length-delimited wire types
+        if mv[pos] & 0x7 != 2:
             break
-        tag = data[pos]
-        pos += 1
-        wire_type = tag & 0x7
-        
-        if wire_type == 2:  # Length-delimited
-            # Read length (varint)
-            length = 0
-            shift = 0
-            while pos < len(data):
-                b = data[pos]
-                pos += 1
-                length |= (b & 0x7f) << shift
-                if not (b & 0x80):
-                    break
-                shift += 7
-            
-            # Parse message
-            if pos + length <= len(data):
-                msg = msg_class()
-                msg.ParseFromString(data[pos:pos + length])
-                results.append(MessageToDict(msg, preserving_proto_field_name=True))
-                pos += length
-        else:
-            # Skip other wire types
+        length, pos = _decode_varint(mv, pos + 1)
+        end = pos + length
+        if end > n:
             break
+
+        # Parse message
+        msg = msg_class()
+        msg.ParseFromString(bytes(mv[pos:end]))
+        results.append(MessageToDict(msg, preserving_proto_field_name=True))
+        pos = end
     return results
 
 
-def parse_game_record(record: dict) -> dict:
-    """Parse raw game record into readable JSON using protobuf definitions"""
+def parse_game_record(record) -> dict:
+    """Parse raw game record into readable JSON using protobuf definitions
+
+    Accepts either a decoded dict (bytes fields base64-encoded) or a
+    native ResGameRecord message, whose data blob is used as-is without
+    a base64 round trip.
+    """
     result = {}
-    
+
+    if isinstance(record, dict):
+        head = record.get("head")
+        data_bytes = record.get("data")
+        if isinstance(data_bytes, LazyB64):
+            data_bytes = data_bytes.raw
+        elif isinstance(data_bytes, str):
+            data_bytes = base64.b64decode(data_bytes)
+    else:
+        head = None
+        if record.HasField("head"):
+            head = MessageToDict(record.head, preserving_proto_field_name=True)
+        data_bytes = record.data
+
     # Parse head info with nested protobuf fields
-    if "head" in record:
-        head = record["head"].copy()
-        
-        # Decode accounts field (PlayerGameView)
-        if "accounts" in head and head["accounts"]:
-            parsed = parse_single_pb(base64.b64decode(head["accounts"]), pb.PlayerGameView)
+    if head:
+        head = head.copy()
+
+        # Decode accounts field (PlayerGameView); already a dict when
+        # the response was decoded by the generated classes
+        accounts = head.get("accounts")
+        if isinstance(accounts, (str, LazyB64)):
+            raw = accounts.raw if isinstance(accounts, LazyB64) else base64.b64decode(accounts)
+            parsed = parse_single_pb(raw, pb.PlayerGameView)
             if parsed:
                 head["accounts"] = parsed
-        
+
         # Decode result.players field (RecordPlayerResult)
         if "result" in head and head["result"]:
-            result_data = head["result"]
-            if "players" in result_data and result_data["players"]:
-                parsed = parse_single_pb(base64.b64decode(result_data["players"]), pb.RecordPlayerResult)
+            players = head["result"].get("players")
+            if isinstance(players, (str, LazyB64)):
+                raw = players.raw if isinstance(players, LazyB64) else base64.b64decode(players)
+                parsed = parse_single_pb(raw, pb.RecordPlayerResult)
                 if parsed:
                     head["result"]["players"] = parsed
-        
+
         result["head"] = head
         result["uuid"] = head.get("uuid")
-    
+
     # Parse game data
-    if "data" not in record or not record["data"]:
+    if not data_bytes:
         result["error"] = "No game data"
         return result
-    
+
     try:
-        data_bytes = base64.b64decode(record["data"])
-        
         # Parse outer Wrapper
         wrapper = pb.Wrapper()
         wrapper.ParseFromString(data_bytes)
@@ -775,20 +1082,28 @@ def parse_game_record(record: dict) -> dict:
         
         result["version"] = detail.version
         result["actions"] = []
-        
+
+        # One Wrapper reused across actions, and the name -> class
+        # lookups memoized; message construction dominates small parses
+        action_wrapper = pb.Wrapper()
+        cls_cache = {}
+
         # Parse each action
         for action in detail.actions:
             if not action.result:
                 continue
-            
+
             # Parse action Wrapper (no XOR decoding needed for new format)
-            action_wrapper = pb.Wrapper()
+            action_wrapper.Clear()
             action_wrapper.ParseFromString(action.result)
-            
+
             # Get message type and parse
-            type_name = action_wrapper.name.split(".")[-1]
-            msg_class = getattr(pb, type_name, None)
-            
+            type_name = action_wrapper.name.rsplit(".", 1)[-1]
+            if type_name in cls_cache:
+                msg_class = cls_cache[type_name]
+            else:
+                msg_class = cls_cache[type_name] = getattr(pb, type_name, None)
+
             if msg_class:
                 msg = msg_class()
                 msg.ParseFromString(action_wrapper.data)
@@ -805,8 +1120,8 @@ def parse_game_record(record: dict) -> dict:
     except Exception as e:
         result["parse_error"] = str(e)
         # Save raw data as fallback
-        result["raw_data"] = record.get("data")
-    
+        result["raw_data"] = base64.b64encode(data_bytes).decode()
+
     return result
 
 
@@ -834,8 +1149,8 @@ def main():
     if args.list is not None:
         asyncio.run(list_records(config, args.list))
     elif args.id:
-        for uuid in args.id:
-            asyncio.run(download_record(config, uuid))
+        # One connection+login shared by all requested records
+        asyncio.run(download_records(config, args.id))
     else:
         parser.print_help()
 